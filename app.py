@@ -15,6 +15,7 @@ from videoDownloader import download_video, relativeToAbsolute
 import main as main_mod  # To use the download functionality from main.py
 from video_processing import get_expected_coordinates
 from coordinate_overlays import get_pose_coordinates, draw_overlays
+from camera_capture import CameraCapture
 
 fps = 60.0  # include `.0` for floating point arithmetic
 videoLength = 0
@@ -59,8 +60,8 @@ else:
     video_cap = None
     dummy_video_frame = np.zeros((480,640,3), dtype=np.uint8)
 
-# Open the webcam.
-webcam_cap = cv2.VideoCapture(0)
+# Open the webcam; a background thread keeps only the freshest frame.
+webcam_cap = CameraCapture(0, width=640, height=480, fps=30)
 if not webcam_cap.isOpened():
     st.write("Webcam not found.")
     webcam_cap = None
@@ -102,64 +103,72 @@ for i in range(1, videoLength + 1):
 
 f = 0
 
-while True:
-    f += 1
-    # --- Top Stream: Expected Video ---
-    if video_cap is not None:
-        ret_v, frame_v = video_cap.read()
-        # if not ret_v:
-        #     # Restart video if ended.
-        #     video_cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-        #     ret_v, frame_v = video_cap.read()
-        frame_v = cv2.resize(frame_v, (640,480))
-        video_frame_rgb = cv2.cvtColor(frame_v, cv2.COLOR_BGR2RGB)
-        video_placeholder.image(video_frame_rgb, channels="RGB")
-    else:
-        video_placeholder.image(dummy_video_frame, channels="RGB")
-
-    # --- Bottom Stream: Live Webcam ---  
-    if webcam_cap is not None:
-        ret_w, frame_w = webcam_cap.read()
-        if not ret_w:
-            break
-        frame_w = cv2.resize(frame_w, (640,480))
-        live_coords = get_pose_coordinates(frame_w)
-        if live_coords is None:
-            # If live pose is not detected, use a fallback dummy.
-            live_coords = {
-                "left_arm": np.array([0.32, 0.52]),
-                "right_arm": np.array([0.68, 0.51]),
-                "left_leg": np.array([0.36, 0.88]),
-                "right_leg": np.array([0.64, 0.91])
-            }
-        # If we have expected coordinates (from the video), overlay them on the webcam feed.
-        if expected_coords_global is not None:
-            frame_w = draw_overlays(frame_w, live_coords, expected_coords_global)
-            # Compute error (for arms) and overlay error/intensity indicators.
-
-            # csv to dict
-            data = np.genfromtxt("coords.csv", delimiter=",", filling_values=np.nan)
-            coords_f = data[f]
-            # print(coords_f)
-            keys = ["left_arm", "right_arm", "left_leg", "right_leg"]
-            coords_dict = {keys[i]: (coords_f[2 * i], coords_f[2 * i + 1]) for i in range(len(keys))}
-
-            left_error = np.linalg.norm(np.array(expected_coords_global["left_arm"]) - np.array(live_coords["left_arm"]))
-            right_error = np.linalg.norm(np.array(expected_coords_global["right_arm"]) - np.array(live_coords["right_arm"]))
-            intensity_left = int(min(left_error/0.1,1.0)*100)
-            intensity_right = int(min(right_error/0.1,1.0)*100)
-            error_text = f"Left Error: {left_error:.2f} Intensity: {intensity_left}% | Right Error: {right_error:.2f} Intensity: {intensity_right}%"
-            cv2.putText(frame_w, error_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255,255,255), 2)
+# Streamlit stops this loop by raising inside it on rerun; free the webcam for the next run.
+try:
+    while True:
+        f += 1
+        # --- Top Stream: Expected Video ---
+        if video_cap is not None:
+            ret_v, frame_v = video_cap.read()
+            # if not ret_v:
+            #     # Restart video if ended.
+            #     video_cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            #     ret_v, frame_v = video_cap.read()
+            frame_v = cv2.resize(frame_v, (640,480))
+            video_frame_rgb = cv2.cvtColor(frame_v, cv2.COLOR_BGR2RGB)
+            video_placeholder.image(video_frame_rgb, channels="RGB")
+        else:
+            video_placeholder.image(dummy_video_frame, channels="RGB")
+
+        # --- Bottom Stream: Live Webcam ---  
+        if webcam_cap is not None:
+            frame_w, _ = webcam_cap.read()
+            if frame_w is None:
+                if webcam_cap.ended:
+                    break
+                continue  # camera stalled; keep waiting like a blocking read would
+            if frame_w.shape[:2] != (480, 640):
+                frame_w = cv2.resize(frame_w, (640,480))
+            live_coords = get_pose_coordinates(frame_w)
+            if live_coords is None:
+                # If live pose is not detected, use a fallback dummy.
+                live_coords = {
+                    "left_arm": np.array([0.32, 0.52]),
+                    "right_arm": np.array([0.68, 0.51]),
+                    "left_leg": np.array([0.36, 0.88]),
+                    "right_leg": np.array([0.64, 0.91])
+                }
+            # If we have expected coordinates (from the video), overlay them on the webcam feed.
+            if expected_coords_global is not None:
+                frame_w = draw_overlays(frame_w, live_coords, expected_coords_global)
+                # Compute error (for arms) and overlay error/intensity indicators.
+
+                # csv to dict
+                data = np.genfromtxt("coords.csv", delimiter=",", filling_values=np.nan)
+                coords_f = data[f]
+                # print(coords_f)
+                keys = ["left_arm", "right_arm", "left_leg", "right_leg"]
+                coords_dict = {keys[i]: (coords_f[2 * i], coords_f[2 * i + 1]) for i in range(len(keys))}
+
+                left_error = np.linalg.norm(np.array(expected_coords_global["left_arm"]) - np.array(live_coords["left_arm"]))
+                right_error = np.linalg.norm(np.array(expected_coords_global["right_arm"]) - np.array(live_coords["right_arm"]))
+                intensity_left = int(min(left_error/0.1,1.0)*100)
+                intensity_right = int(min(right_error/0.1,1.0)*100)
+                error_text = f"Left Error: {left_error:.2f} Intensity: {intensity_left}% | Right Error: {right_error:.2f} Intensity: {intensity_right}%"
+                cv2.putText(frame_w, error_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255,255,255), 2)
             
-            data = f"{intensity_left},{intensity_right}\n"
-            sock.sendto(data.encode(), (ESP_IP, ESP_PORT))
+                data = f"{intensity_left},{intensity_right}\n"
+                sock.sendto(data.encode(), (ESP_IP, ESP_PORT))
+            else:
+                # If expected coordinates not available, just overlay live coordinates.
+                frame_w = draw_overlays(frame_w, live_coords, live_coords)
+            webcam_frame_rgb = cv2.cvtColor(frame_w, cv2.COLOR_BGR2RGB)
+            webcam_placeholder.image(webcam_frame_rgb, channels="RGB")
         else:
-            # If expected coordinates not available, just overlay live coordinates.
-            frame_w = draw_overlays(frame_w, live_coords, live_coords)
-        webcam_frame_rgb = cv2.cvtColor(frame_w, cv2.COLOR_BGR2RGB)
-        webcam_placeholder.image(webcam_frame_rgb, channels="RGB")
-    else:
-        webcam_placeholder.image(dummy_webcam_frame, channels="RGB")
+            webcam_placeholder.image(dummy_webcam_frame, channels="RGB")
     
-    # Adjust sleep for x FPS
-    time.sleep(1/fps)
\ No newline at end of file
+        # Adjust sleep for x FPS
+        time.sleep(1/fps)
+finally:
+    if webcam_cap is not None:
+        webcam_cap.release()
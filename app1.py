@@ -7,13 +7,15 @@ import streamlit as st
 import time
 import csv
 import socket
-import tempfile
 
 # Import custom modules
 from videoDownloader import download_video, relativeToAbsolute
 import main as main_mod  # for downloading video
 from video_processing import get_expected_coordinates
-from coordinate_overlays import get_pose_coordinates, draw_overlays
+from coordinate_overlays import get_pose_coordinates, draw_overlays, draw_error_text
+from camera_capture import CameraCapture
+from replay_export import SessionRecorder
+from upload_ingest import load_track, store_upload, pin_artefact, unpin_artefact, coords_to_track, track_coords
 
 # Socket setup for sending intensity data to NodeMCU/ESP32
 ESP_IP = "192.168.72.112"  # update as needed
@@ -26,6 +28,8 @@ def resize_with_aspect_ratio(frame, width=None, height=None, inter=cv2.INTER_ARE
     (h, w) = frame.shape[:2]
     if width is None and height is None:
         return frame
+    if width == w or (width is None and height == h):
+        return frame  # already negotiated at this size
     if width is not None:
         r = width / float(w)
         dim = (width, int(h * r))
@@ -53,39 +57,42 @@ st.write("The **left column** shows the expected dance video (with red overlays)
 # Slider for playback speed control.
 playback_speed = st.slider("Playback Speed (FPS)", min_value=1, max_value=120, value=60, step=1)
 
+# Recorded sessions (webcam video + live coordinates CSV) are the input for replay_export.py.
+record_session = st.checkbox("Record this session for replay export", value=False)
+
 # --- Option: Use Existing CSV & Video ---
 use_existing = st.checkbox("Use existing CSV & MP4 video (skip download/pre-processing)", value=False)
 if use_existing:
     uploaded_csv = st.file_uploader("Upload CSV file with coordinates", type="csv")
     uploaded_video = st.file_uploader("Upload MP4 video file (expected video)", type="mp4")
     
-    if uploaded_csv is not None and uploaded_video is not None:
-        csv_coords = []
-        content = uploaded_csv.read().decode('utf-8').splitlines()
-        csv_reader = csv.reader(content)
-        for row in csv_reader:
-            if len(row) == 8:
-                row = list(map(float, row))
-                coord = {
-                    "left_arm": (row[0], row[1]),
-                    "right_arm": (row[2], row[3]),
-                    "left_leg": (row[4], row[5]),
-                    "right_leg": (row[6], row[7])
-                }
-                csv_coords.append(coord)
-        if csv_coords:
-            st.session_state.csv_coords = csv_coords
+    # Streamlit reruns this script on every interaction; only ingest uploads that changed,
+    # or whose cached video has gone missing.
+    if uploaded_csv is not None and uploaded_video is not None and \
+            (st.session_state.get("uploaded_ids") != (uploaded_csv.file_id, uploaded_video.file_id) or
+             not os.path.exists(st.session_state.get("downloaded_video_path") or "")):
+        # Both uploads are streamed in chunks; files seen before are reused from the cache.
+        csv_track = load_track(uploaded_csv)
+        if len(csv_track):
+            video_path, _ = store_upload(uploaded_video, ".mp4")
+            unpin_artefact(st.session_state.get("downloaded_video_path"))
+            pin_artefact(video_path)  # keep it cached while this session plays it
+            st.session_state.csv_coords = csv_track
+            st.session_state.downloaded_video_path = video_path
+            st.session_state.uploaded_ids = (uploaded_csv.file_id, uploaded_video.file_id)
             st.success("CSV loaded successfully.")
+            st.success("Video file loaded successfully.")
         else:
+            unpin_artefact(st.session_state.get("downloaded_video_path"))
+            st.session_state.pop("csv_coords", None)
+            st.session_state.pop("downloaded_video_path", None)
+            st.session_state.pop("uploaded_ids", None)
             st.error("Uploaded CSV contains no valid data.")
-        # Save the uploaded video to a temporary file.
-        tfile = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4')
-        tfile.write(uploaded_video.read())
-        st.session_state.downloaded_video_path = tfile.name
-        st.success("Video file loaded successfully.")
 else:
+    unpin_artefact(st.session_state.get("downloaded_video_path"))
     st.session_state.pop("csv_coords", None)
     st.session_state.pop("downloaded_video_path", None)
+    st.session_state.pop("uploaded_ids", None)
 
 # --- Section 1: Download Video and Pre-process (if not using existing) ---
 video_url = st.text_input("Enter YouTube URL", "")
@@ -135,7 +142,7 @@ if not use_existing:
                                          row["right_arm"][0], row["right_arm"][1],
                                          row["left_leg"][0], row["left_leg"][1],
                                          row["right_leg"][0], row["right_leg"][1]])
-            st.session_state.csv_coords = coords_list  # Also store in session state for fast access.
+            st.session_state.csv_coords = coords_to_track(coords_list)  # Also store in session state for fast access.
             st.success(f"Pre-processed coordinates extracted from {len(coords_list)} frames and saved to CSV.")
         else:
             st.error("No valid coordinates were extracted. Adjust mediapipe parameters or check video quality.")
@@ -149,6 +156,7 @@ with col1:
 with col2:
     st.subheader("Live Webcam Feed")
     webcam_placeholder = st.empty()
+    capture_stats_placeholder = st.empty()
 
 # Open expected video if available.
 if st.session_state.get("downloaded_video_path"):
@@ -158,76 +166,97 @@ else:
     dummy_video_frame = np.zeros((480,640,3), dtype=np.uint8)
 
 # Load pre-processed coordinates from session state.
-if "csv_coords" in st.session_state and st.session_state.csv_coords:
+if st.session_state.get("csv_coords") is not None and len(st.session_state.csv_coords):
     csv_coords = st.session_state.csv_coords
 else:
-    csv_coords = [{"left_arm": (0,0), "right_arm": (0,0), "left_leg": (0,0), "right_leg": (0,0)}]
+    csv_coords = np.zeros((1, 8))
 num_csv_frames = len(csv_coords)
 
-# Open the webcam.
-webcam_cap = cv2.VideoCapture(0)
+# Open the webcam. Frames are grabbed on a background thread at the display size,
+# so each loop scores the freshest pose rather than a stale buffered frame.
+webcam_cap = CameraCapture(0, width=800, height=600, fps=30)
 if not webcam_cap.isOpened():
     st.write("Webcam not found.")
     webcam_cap = None
     dummy_webcam_frame = np.zeros((480,640,3), dtype=np.uint8)
 
+# Start recording the raw webcam frames and live coordinates if requested.
+session_recorder = None
+if record_session and webcam_cap is not None:
+    os.makedirs(relativeToAbsolute("/src/sessions/"), exist_ok=True)
+    session_recorder = SessionRecorder(relativeToAbsolute(f"/src/sessions/session_{int(time.time())}"), webcam_cap.fps or 30)
+
 # Initialize CSV frame counter.
 csv_idx = 0
 
 # --- Main Loop: Update Both Streams ---
-while True:
-    start_time = time.time()
+# Streamlit stops this loop by raising inside it on rerun, so clean up in finally.
+try:
+    if session_recorder is not None:
+        st.write(f"Recording session to {session_recorder.video_path}")
+    while True:
+        start_time = time.time()
     
-    # --- Top Stream: Expected Dance Video ---
-    if video_cap is not None:
-        frame_v = video_cap.read()[1]
-        if frame_v is None:
-            video_cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        # --- Top Stream: Expected Dance Video ---
+        if video_cap is not None:
             frame_v = video_cap.read()[1]
-        frame_v = resize_with_aspect_ratio(frame_v, width=640)
-        exp_coords = csv_coords[csv_idx % num_csv_frames]
-        frame_v = draw_overlays(frame_v, exp_coords, exp_coords)
-        top_frame = cv2.cvtColor(frame_v, cv2.COLOR_BGR2RGB)
-        expected_placeholder.image(top_frame, channels="RGB")
-    else:
-        expected_placeholder.image(dummy_video_frame, channels="RGB")
+            if frame_v is None:
+                video_cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                frame_v = video_cap.read()[1]
+            frame_v = resize_with_aspect_ratio(frame_v, width=640)
+            exp_coords = track_coords(csv_coords, csv_idx % num_csv_frames)
+            frame_v = draw_overlays(frame_v, exp_coords, exp_coords)
+            top_frame = cv2.cvtColor(frame_v, cv2.COLOR_BGR2RGB)
+            expected_placeholder.image(top_frame, channels="RGB")
+        else:
+            expected_placeholder.image(dummy_video_frame, channels="RGB")
     
-    # --- Bottom Stream: Live Webcam Feed ---
-    if webcam_cap is not None:
-        frame_w = webcam_cap.read()[1]
-        if frame_w is None:
-            break
-        frame_w = resize_with_aspect_ratio(frame_w, width=800)  # Larger display for webcam.
-        live_coords = get_pose_coordinates(frame_w)
-        # If no person is detected, display raw frame.
-        if live_coords is None:
-            webcam_placeholder.image(cv2.cvtColor(frame_w, cv2.COLOR_BGR2RGB), channels="RGB")
-            csv_idx += 1
-            elapsed = time.time() - start_time
-            delay = max(0, (1/playback_speed) - elapsed)
-            time.sleep(delay)
-            continue
-        exp_coords_for_webcam = csv_coords[csv_idx % num_csv_frames]
-        frame_w = draw_overlays(frame_w, live_coords, exp_coords_for_webcam)
-        left_error = np.linalg.norm(np.array(exp_coords_for_webcam["left_arm"]) - np.array(live_coords["left_arm"]))
-        right_error = np.linalg.norm(np.array(exp_coords_for_webcam["right_arm"]) - np.array(live_coords["right_arm"]))
-        print("Left Error is {left_error} and Right Error is {right_error}")
-        intensity_left = int(min(left_error/0.4, 1.0) * 100)
-        intensity_right = int(min(right_error/0.4, 1.0) * 100)
-        error_text = f"Left Error: {left_error:.2f} | Intensity: {intensity_left}%   Right Error: {right_error:.2f} | Intensity: {intensity_right}%"
-        cv2.putText(frame_w, error_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255,255,255), 2)
-        bottom_frame = cv2.cvtColor(frame_w, cv2.COLOR_BGR2RGB)
-        webcam_placeholder.image(bottom_frame, channels="RGB")
+        # --- Bottom Stream: Live Webcam Feed ---
+        if webcam_cap is not None:
+            frame_w, capture_ts = webcam_cap.read()
+            if frame_w is None:
+                if webcam_cap.ended:
+                    break
+                continue  # camera stalled; keep waiting like a blocking read would
+            frame_w = resize_with_aspect_ratio(frame_w, width=800)  # Larger display for webcam.
+            live_coords = get_pose_coordinates(frame_w)
+            if session_recorder is not None:
+                session_recorder.write(frame_w, live_coords, capture_ts)
+            # If no person is detected, display raw frame.
+            if live_coords is None:
+                webcam_placeholder.image(cv2.cvtColor(frame_w, cv2.COLOR_BGR2RGB), channels="RGB")
+                csv_idx += 1
+                elapsed = time.time() - start_time
+                delay = max(0, (1/playback_speed) - elapsed)
+                time.sleep(delay)
+                continue
+            exp_coords_for_webcam = track_coords(csv_coords, csv_idx % num_csv_frames)
+            frame_w = draw_overlays(frame_w, live_coords, exp_coords_for_webcam)
+            left_error, right_error, intensity_left, intensity_right = draw_error_text(frame_w, live_coords, exp_coords_for_webcam)
+            print("Left Error is {left_error} and Right Error is {right_error}")
+            bottom_frame = cv2.cvtColor(frame_w, cv2.COLOR_BGR2RGB)
+            webcam_placeholder.image(bottom_frame, channels="RGB")
         
-        # Transmit both intensities via UDP.
-        data = f"{intensity_left},{intensity_right}\n"
-        sock.sendto(data.encode(), (ESP_IP, ESP_PORT))
-    else:
-        webcam_placeholder.image(dummy_webcam_frame, channels="RGB")
+            # Transmit both intensities via UDP.
+            data = f"{intensity_left},{intensity_right}\n"
+            sock.sendto(data.encode(), (ESP_IP, ESP_PORT))
+        else:
+            webcam_placeholder.image(dummy_webcam_frame, channels="RGB")
     
-    csv_idx += 1
-    elapsed = time.time() - start_time––
-    delay = max(0, (1/playback_speed) - elapsed)
-    time.sleep(delay)
+        if webcam_cap is not None and csv_idx % 30 == 0:
+            capture_stats = webcam_cap.stats()
+            capture_stats_placeholder.caption(
+                f"Frame age: {capture_stats['frame_age_mean_ms']:.0f} ms avg, "
+                f"{capture_stats['frame_age_max_ms']:.0f} ms max | Dropped frames: {capture_stats['dropped']}")
+        csv_idx += 1
+        elapsed = time.time() - start_time
+        delay = max(0, (1/playback_speed) - elapsed)
+        time.sleep(delay)
     
-    # TODO: Future work for networking: pack additional data if needed.
+        # TODO: Future work for networking: pack additional data if needed.
+finally:
+    # Free the webcam so the capture opened by the next rerun can use it.
+    if webcam_cap is not None:
+        webcam_cap.release()
+    if session_recorder is not None:
+        session_recorder.close()
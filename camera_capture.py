@@ -0,0 +1,207 @@
+# camera_capture.py
+# Latest-frame capture backends. A background thread keeps grabbing frames so that
+# read() always hands out the freshest one instead of the oldest frame in OpenCV's buffer.
+import threading
+import time
+
+import cv2
+
+
+class FrameAgeStats:
+    """Running statistics of frame age: time from capture to use, in seconds."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, age):
+        self.count += 1
+        self.total += age
+        self.max = max(self.max, age)
+        self.last = age
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class CameraCapture:
+    """
+    Capture from a camera on a background thread, keeping only the newest frame.
+    Resolution, fps and pixel format (e.g. "MJPG") are requested from the driver
+    up front; the values the camera actually agreed to are in width/height/fps.
+    """
+
+    def __init__(self, source=0, width=None, height=None, fps=None, fourcc="MJPG"):
+        self.cap = cv2.VideoCapture(source)
+        self.width = self.height = self.fps = None
+        self.frames_captured = 0
+        self.frames_dropped = 0  # captured but replaced before anyone read them
+        self.frame_age = FrameAgeStats()
+        self._frame = None
+        self._timestamp = None
+        self._fresh = False
+        self._running = False
+        self.ended = False  # True once the source has no more frames or was released
+        self._cond = threading.Condition()
+        self._thread = None
+        if self.cap.isOpened():
+            self._negotiate(width, height, fps, fourcc)
+            self.start()
+
+    def _negotiate(self, width, height, fps, fourcc):
+        # The pixel format has to be set before the size for most V4L2/DirectShow drivers.
+        if fourcc:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        if width:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps:
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or fps
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _grab(self):
+        """Return the next frame from the source, or None when it has ended."""
+        ret, frame = self.cap.read()
+        return frame if ret else None
+
+    def _run(self):
+        try:
+            while self._running:
+                frame = self._grab()
+                timestamp = time.monotonic()
+                with self._cond:
+                    if frame is None:
+                        self._running = False
+                        self.ended = True
+                    else:
+                        if self._fresh:
+                            self.frames_dropped += 1
+                        self._frame = frame
+                        self._timestamp = timestamp
+                        self._fresh = True
+                        self.frames_captured += 1
+                    self._cond.notify_all()
+        finally:
+            # Only this thread reads from cap, so only it may release it safely.
+            self.cap.release()
+
+    def read(self, timeout=1.0):
+        """
+        Return (frame, capture_timestamp) for the newest frame not returned before,
+        waiting up to timeout seconds for one. Returns (None, None) if the source has
+        ended or nothing arrived in time; check ended to tell the two apart.
+        Timestamps are time.monotonic() values.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._fresh or not self._running, timeout):
+                return None, None
+            if not self._fresh:
+                return None, None
+            self._fresh = False
+            frame, timestamp = self._frame, self._timestamp
+        self.frame_age.add(time.monotonic() - timestamp)
+        return frame, timestamp
+
+    def stats(self):
+        return {
+            "captured": self.frames_captured,
+            "dropped": self.frames_dropped,
+            "frame_age_mean_ms": self.frame_age.mean * 1000,
+            "frame_age_max_ms": self.frame_age.max * 1000,
+            "frame_age_last_ms": self.frame_age.last * 1000,
+        }
+
+    def release(self):
+        """
+        Stop capturing. The grab thread releases the device once its current read
+        returns, which for a stalled camera can take longer than the join timeout.
+        """
+        with self._cond:
+            self._running = False
+            self.ended = True
+            self._cond.notify_all()
+        if self._thread is None:
+            self.cap.release()
+        elif self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+
+
+class FileCapture(CameraCapture):
+    """
+    Same interface as CameraCapture, backed by a video file replayed at its native fps.
+    Frames the consumer is too slow for are dropped just like with a live camera, so it
+    can stand in for a webcam in tests and benchmarks. Set loop=True to replay forever.
+    """
+
+    def __init__(self, path, width=None, height=None, loop=False):
+        self.loop = loop
+        self._target_size = (width, height)
+        self._start_time = None
+        self._frame_index = 0
+        super().__init__(path, fourcc=None)
+
+    def _negotiate(self, width, height, fps, fourcc):
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        src_w = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        src_h = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        width, height = self._target_size
+        if width and not height:
+            height = int(src_h * width / float(src_w))
+        elif height and not width:
+            width = int(src_w * height / float(src_h))
+        self.width = width or src_w
+        self.height = height or src_h
+
+    def _grab(self):
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        if not ret:
+            return None
+        # Pace delivery at the file's native frame rate.
+        if self._start_time is None:
+            self._start_time = time.monotonic()
+        delay = self._start_time + self._frame_index / self.fps - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._frame_index += 1
+        # A file cannot negotiate its size, so scale on the capture thread instead.
+        if frame.shape[1] != self.width or frame.shape[0] != self.height:
+            frame = cv2.resize(frame, (self.width, self.height), interpolation=cv2.INTER_AREA)
+        return frame
+
+
+if __name__ == "__main__":
+    # Benchmark: python camera_capture.py [video.mp4] [seconds]
+    import sys
+
+    source = sys.argv[1] if len(sys.argv) > 1 else None
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+    cap = FileCapture(source) if source else CameraCapture(0, width=800, height=600, fps=30)
+    print(f"Negotiated {cap.width}x{cap.height} @ {cap.fps} fps")
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        frame, _ = cap.read()
+        if frame is None:
+            if cap.ended:
+                break
+            continue
+        time.sleep(0.05)  # simulate a slow consumer (pose detection + drawing)
+    cap.release()
+    print(cap.stats())
@@ -1,5 +1,6 @@
 # coordinate_overlays.py
 import cv2
+import numpy as np
 import mediapipe as mp
 
 mp_pose = mp.solutions.pose
@@ -63,3 +64,17 @@ def draw_overlays(frame, actual_coords, expected_coords):
     cv2.line(frame, expected_positions["left_arm"], expected_positions["right_leg"], cyan, 2)
     cv2.line(frame, expected_positions["right_arm"], expected_positions["left_leg"], cyan, 2)
     return frame
+
+def draw_error_text(frame, actual_coords, expected_coords, max_error=0.4):
+    """
+    Compute the left/right arm errors between actual and expected coordinates,
+    map them to haptic intensities (0-100) and write them across the top of the frame.
+    Returns (left_error, right_error, intensity_left, intensity_right).
+    """
+    left_error = np.linalg.norm(np.array(expected_coords["left_arm"]) - np.array(actual_coords["left_arm"]))
+    right_error = np.linalg.norm(np.array(expected_coords["right_arm"]) - np.array(actual_coords["right_arm"]))
+    intensity_left = int(min(left_error / max_error, 1.0) * 100)
+    intensity_right = int(min(right_error / max_error, 1.0) * 100)
+    error_text = f"Left Error: {left_error:.2f} | Intensity: {intensity_left}%   Right Error: {right_error:.2f} | Intensity: {intensity_right}%"
+    cv2.putText(frame, error_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    return left_error, right_error, intensity_left, intensity_right
@@ -0,0 +1,311 @@
+# replay_export.py
+# Offline side-by-side replay of a recorded session: expected video (red overlays)
+# on the left, the recorded live video (green + red overlays and error text) on the right.
+import argparse
+import csv
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from coordinate_overlays import get_pose_coordinates, draw_overlays, draw_error_text
+from upload_ingest import read_track, track_coords, TRACK_KEYS, TRACK_WIDTH
+
+PANEL_HEIGHT = 480  # both panels are scaled to this height before being placed side by side
+QUEUE_SIZE = 32  # frames buffered between pipeline stages
+RATE_PROBE_FRAMES = 30  # frames a recording buffers to measure the real capture rate
+_DONE = object()
+
+
+def session_fps(timestamps):
+    """Average frame rate of a recording from its capture timestamps, or None if unknown."""
+    if len(timestamps) < 2:
+        return None
+    span = timestamps[-1] - timestamps[0]
+    return float((len(timestamps) - 1) / span) if span > 0 else None
+
+
+def resize_to_height(frame, height=PANEL_HEIGHT, inter=cv2.INTER_AREA):
+    (h, w) = frame.shape[:2]
+    if h == height:
+        return frame
+    return cv2.resize(frame, (int(w * height / float(h)), height), interpolation=inter)
+
+
+def _decode(expected_path, session_path, out_q, errors):
+    """Decode stage: read the session video frame by frame, looping the expected video alongside it."""
+    expected_cap = cv2.VideoCapture(expected_path)
+    session_cap = cv2.VideoCapture(session_path)
+    frames = 0
+    try:
+        if not session_cap.isOpened():
+            raise IOError(f"Could not open session video {session_path}")
+        if not expected_cap.isOpened():
+            raise IOError(f"Could not open expected video {expected_path}")
+        while True:
+            ret, frame_l = session_cap.read()
+            if not ret:
+                if frames == 0:
+                    raise IOError(f"Could not read session video {session_path}")
+                break
+            frames += 1
+            ret, frame_v = expected_cap.read()
+            if not ret:
+                expected_cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame_v = expected_cap.read()
+                if not ret:
+                    raise IOError(f"Could not read expected video {expected_path}")
+            out_q.put((resize_to_height(frame_v), resize_to_height(frame_l)))
+    except Exception as e:
+        errors.append(e)
+    finally:
+        expected_cap.release()
+        session_cap.release()
+        out_q.put(_DONE)
+
+
+def _draw(track, session_track, in_q, out_q, errors):
+    """Draw stage: overlay expected/live coordinates and the error text, then join the panels."""
+    idx = 0
+    try:
+        while True:
+            item = in_q.get()
+            if item is _DONE:
+                break
+            frame_v, frame_l = item
+            exp_coords = track_coords(track, idx % len(track))
+            frame_v = draw_overlays(frame_v, exp_coords, exp_coords)
+            if session_track is not None:
+                live_idx = idx % len(session_track)
+                # NaN rows are frames where no pose was detected during recording.
+                if np.isnan(session_track[live_idx]).any():
+                    live_coords = None
+                else:
+                    live_coords = track_coords(session_track, live_idx)
+            else:
+                live_coords = get_pose_coordinates(frame_l)
+            if live_coords is not None:
+                frame_l = draw_overlays(frame_l, live_coords, exp_coords)
+                draw_error_text(frame_l, live_coords, exp_coords)
+            out_q.put(np.hstack((frame_v, frame_l)))
+            idx += 1
+    except Exception as e:
+        errors.append(e)
+        # Keep draining so the decode stage never blocks on a full queue.
+        while in_q.get() is not _DONE:
+            pass
+    finally:
+        out_q.put(_DONE)
+
+
+def _encode(out_path, fps, in_q, errors, counter):
+    """Encode stage: write composited frames with cv2.VideoWriter."""
+    writer = None
+    try:
+        while True:
+            frame = in_q.get()
+            if frame is _DONE:
+                break
+            if errors:
+                continue
+            if writer is None:
+                h, w = frame.shape[:2]
+                writer = cv2.VideoWriter(out_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
+                if not writer.isOpened():
+                    raise IOError(f"Could not open {out_path} for writing")
+            writer.write(frame)
+            counter[0] += 1
+    except Exception as e:
+        errors.append(e)
+        while in_q.get() is not _DONE:
+            pass
+    finally:
+        if writer is not None:
+            writer.release()
+            if errors:
+                os.remove(out_path)  # don't leave a truncated replay behind
+
+
+def export_replay(expected_path, track_path, session_path, out_path, session_track_path=None):
+    """
+    Write an annotated side-by-side replay of one recorded session to out_path.
+    Sessions are recorded by app1.py with SessionRecorder (a video plus a CSV).
+    Decoding, overlay drawing and encoding run on separate threads connected by
+    bounded queues, so the three stages overlap. If session_track_path is not
+    given, live coordinates are detected from the session video with MediaPipe.
+    The replay rate comes from the capture timestamps in the session CSV, since the
+    live loop runs slower than the camera; the video header fps is only a fallback.
+    Returns a dict with the frame count, replay duration, wall time and speed as a multiple of real time.
+    """
+    track = read_track(track_path)
+    if not len(track):
+        raise ValueError(f"{track_path} contains no valid coordinates")
+    session_track = timestamps = None
+    if session_track_path:
+        session = read_track(session_track_path, columns=TRACK_WIDTH + 1)
+        if len(session):
+            session_track, timestamps = session[:, :TRACK_WIDTH], session[:, TRACK_WIDTH]
+        else:
+            session_track = read_track(session_track_path)  # recorded without timestamps
+        if not len(session_track):
+            raise ValueError(f"{session_track_path} contains no valid coordinates")
+
+    cap = cv2.VideoCapture(session_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open session video {session_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    fps = fps if fps > 0 else 30.0
+    cap.release()
+    if timestamps is not None:
+        fps = session_fps(timestamps) or fps
+
+    decoded_q = queue.Queue(maxsize=QUEUE_SIZE)
+    drawn_q = queue.Queue(maxsize=QUEUE_SIZE)
+    errors = []
+    counter = [0]
+    stages = [
+        threading.Thread(target=_decode, args=(expected_path, session_path, decoded_q, errors)),
+        threading.Thread(target=_draw, args=(track, session_track, decoded_q, drawn_q, errors)),
+        threading.Thread(target=_encode, args=(out_path, fps, drawn_q, errors, counter)),
+    ]
+    start_time = time.time()
+    for stage in stages:
+        stage.start()
+    for stage in stages:
+        stage.join()
+    elapsed = time.time() - start_time
+    if errors:
+        raise errors[0]
+
+    frames = counter[0]
+    duration = frames / fps
+    return {
+        "output": out_path,
+        "frames": frames,
+        "duration": duration,
+        "seconds": elapsed,
+        "speed": duration / elapsed if elapsed > 0 else float("inf"),
+    }
+
+
+class SessionRecorder:
+    """
+    Record a live session as input for export_replay: the raw webcam frames go to
+    <base>.mp4 and the live coordinates of each frame to <base>.csv, in the same
+    8-column layout as the expected-video CSV plus the frame's capture timestamp.
+    Frames without a detected pose get NaN coordinates so the CSV stays aligned
+    with the video. The video's fps is measured from the first RATE_PROBE_FRAMES
+    timestamps; fps is only used if too few frames were recorded to measure it.
+    """
+
+    def __init__(self, base_path, fps):
+        self.video_path = base_path + ".mp4"
+        self.csv_path = base_path + ".csv"
+        self.fps = fps
+        self.writer = None
+        self._pending = []  # (frame, timestamp) buffered until the rate is known
+        self.csv_file = open(self.csv_path, mode="w", newline="")
+        self.csv_writer = csv.writer(self.csv_file)
+        self.csv_writer.writerow(["left_arm_x", "left_arm_y", "right_arm_x", "right_arm_y",
+                                  "left_leg_x", "left_leg_y", "right_leg_x", "right_leg_y", "timestamp"])
+
+    def write(self, frame, coords, timestamp):
+        if coords is None:
+            self.csv_writer.writerow(["nan"] * TRACK_WIDTH + [timestamp])
+        else:
+            self.csv_writer.writerow([v for key in TRACK_KEYS for v in coords[key]] + [timestamp])
+        if self.writer is not None:
+            self.writer.write(frame)
+            return
+        # The caller draws overlays on the frame afterwards, so buffer a copy.
+        self._pending.append((frame.copy(), timestamp))
+        if len(self._pending) >= RATE_PROBE_FRAMES:
+            self._open_writer()
+
+    def _open_writer(self):
+        self.fps = session_fps([t for _, t in self._pending]) or self.fps
+        h, w = self._pending[0][0].shape[:2]
+        self.writer = cv2.VideoWriter(self.video_path, cv2.VideoWriter_fourcc(*"mp4v"), self.fps, (w, h))
+        for frame, _ in self._pending:
+            self.writer.write(frame)
+        self._pending = []
+
+    def close(self):
+        if self.writer is None and self._pending:
+            self._open_writer()
+        if self.writer is not None:
+            self.writer.release()
+        self.csv_file.close()
+
+
+def _failed(job, error):
+    return {"output": job[3], "error": f"{type(error).__name__}: {error}"}
+
+
+def export_batch(expected_path, track_path, sessions, workers=None):
+    """
+    Export several sessions against the same expected video, one process per session.
+    sessions is a list of (session_path, out_path, session_track_path or None).
+    Returns the per-session results in the same order; a session that failed gets
+    a dict with its output path and an "error" message instead of stopping the batch.
+    """
+    jobs = [(expected_path, track_path, session_path, out_path, session_track_path)
+            for session_path, out_path, session_track_path in sessions]
+    results = []
+    if len(jobs) == 1:
+        try:
+            results.append(export_replay(*jobs[0]))
+        except Exception as e:
+            results.append(_failed(jobs[0], e))
+        return results
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(export_replay, *job) for job in jobs]
+        for job, future in zip(jobs, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(_failed(job, e))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export annotated side-by-side replays of recorded sessions.")
+    parser.add_argument("--expected", required=True, help="expected dance video (mp4)")
+    parser.add_argument("--track", required=True, help="coordinates CSV of the expected video")
+    parser.add_argument("--session", required=True, action="append",
+                        help="recorded live session video; repeat for batch export")
+    parser.add_argument("--session-track", action="append", default=[],
+                        help="coordinates CSV of a session, in the same order as --session (optional)")
+    parser.add_argument("--out-dir", default="src/replays", help="directory for the exported videos")
+    parser.add_argument("--workers", type=int, default=None, help="parallel export processes")
+    args = parser.parse_args()
+
+    if args.session_track and len(args.session_track) != len(args.session):
+        parser.error("--session-track must be given once per --session")
+    session_tracks = args.session_track or [None] * len(args.session)
+    os.makedirs(args.out_dir, exist_ok=True)
+    sessions = []
+    for session_path, session_track_path in zip(args.session, session_tracks):
+        name = os.path.splitext(os.path.basename(session_path))[0]
+        sessions.append((session_path, os.path.join(args.out_dir, f"replay_{name}.mp4"), session_track_path))
+
+    batch_start = time.time()
+    results = export_batch(args.expected, args.track, sessions, args.workers)
+    exported = [r for r in results if "error" not in r]
+    for result in results:
+        if "error" in result:
+            print(f"{result['output']}: FAILED ({result['error']})")
+        else:
+            print(f"{result['output']}: {result['frames']} frames in {result['seconds']:.1f}s "
+                  f"({result['speed']:.1f}x real time)")
+    batch_elapsed = time.time() - batch_start
+    batch_duration = sum(r["duration"] for r in exported)
+    print(f"Batch: {len(exported)}/{len(results)} sessions exported in {batch_elapsed:.1f}s "
+          f"({batch_duration / batch_elapsed:.1f}x real time)")
+    if len(exported) < len(results):
+        sys.exit(1)
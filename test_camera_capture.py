@@ -0,0 +1,50 @@
+# test_camera_capture.py
+import time
+
+import cv2
+import numpy as np
+
+from camera_capture import FileCapture
+
+
+def make_clip(path, frames, fps):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (64, 48))
+    for i in range(frames):
+        writer.write(np.full((48, 64, 3), i % 256, dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+
+def test_slow_consumer_gets_freshest_frames(tmp_path):
+    cap = FileCapture(make_clip(tmp_path / "clip.mp4", frames=30, fps=30))
+    timestamps = []
+    try:
+        while True:
+            frame, timestamp = cap.read(timeout=0.5)
+            if frame is None:
+                if cap.ended:
+                    break
+                continue
+            timestamps.append(timestamp)
+            time.sleep(0.08)  # slower than the clip's 30 fps
+    finally:
+        cap.release()
+    assert cap.ended
+    assert len(timestamps) > 1
+    assert all(b > a for a, b in zip(timestamps, timestamps[1:]))
+    assert cap.frames_captured == 30
+    assert cap.frames_dropped > 0
+    assert cap.frame_age.count == len(timestamps)
+    assert cap.frame_age.max >= cap.frame_age.mean > 0
+
+
+def test_read_times_out_before_source_ends(tmp_path):
+    cap = FileCapture(make_clip(tmp_path / "slow.mp4", frames=4, fps=2))
+    try:
+        frame, timestamp = cap.read(timeout=1.0)
+        assert frame is not None and timestamp is not None
+        frame, timestamp = cap.read(timeout=0.05)  # next frame is due in 0.5 s
+        assert frame is None and timestamp is None
+        assert not cap.ended
+    finally:
+        cap.release()
@@ -0,0 +1,52 @@
+# test_upload_ingest.py
+import os
+from io import BytesIO
+
+import pytest
+
+import upload_ingest
+
+ROW = b"0.1,0.2,0.3,0.4,0.5,0.6,0.7,0.8"
+HEADER = b"left_arm_x,left_arm_y,right_arm_x,right_arm_y,left_leg_x,left_leg_y,right_leg_x,right_leg_y"
+
+
+def parse(data):
+    fileobj = BytesIO(data)
+    _, max_rows = upload_ingest.hash_upload(fileobj)
+    return upload_ingest.parse_track(fileobj, max_rows)
+
+
+@pytest.mark.parametrize("data, rows", [
+    (b"h\r" + ROW + b"\r" + ROW + b"\r" + ROW, 3),  # CR-only line endings
+    (HEADER + b"\r\n" + ROW + b"\r\n" + ROW + b"\r\n", 2),
+    (b"\xef\xbb\xbf" + ROW + b"\n" + ROW + b"\n", 2),  # Excel BOM
+    (ROW + b"\n" + ROW, 2),  # no trailing newline
+    (ROW + b"\r" + ROW + b"\n" + ROW + b"\r\n" + ROW, 4),  # mixed endings
+])
+def test_parse_track_shape(data, rows):
+    track = parse(data)
+    assert track.shape == (rows, upload_ingest.TRACK_WIDTH)
+    assert track[0, 0] == pytest.approx(0.1)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, len(ROW), len(ROW) + 1, len(ROW) + 2])
+def test_crlf_split_across_chunks(monkeypatch, chunk_size):
+    monkeypatch.setattr(upload_ingest.iter_chunks, "__defaults__", (chunk_size,))
+    data = (ROW + b"\r\n") * 5
+    _, max_rows = upload_ingest.hash_upload(BytesIO(data))
+    assert max_rows == 5
+    assert parse(data).shape == (5, upload_ingest.TRACK_WIDTH)
+
+
+def test_prune_cache_keeps_pinned(monkeypatch, tmp_path):
+    monkeypatch.setattr(upload_ingest, "cache_dir", lambda: str(tmp_path))
+    video_path, _ = upload_ingest.store_upload(BytesIO(b"video"), ".mp4")
+    upload_ingest.pin_artefact(video_path)
+    try:
+        for i in range(upload_ingest.MAX_CACHED_FILES + 2):
+            upload_ingest.store_upload(BytesIO(b"other %d" % i), ".mp4")
+        assert (tmp_path / os.path.basename(video_path)).exists()
+    finally:
+        upload_ingest.unpin_artefact(video_path)
+    upload_ingest.prune_cache()
+    assert not (tmp_path / os.path.basename(video_path)).exists()
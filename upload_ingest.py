@@ -0,0 +1,205 @@
+# upload_ingest.py
+import csv
+import hashlib
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from videoDownloader import relativeToAbsolute
+
+CHUNK_SIZE = 1024 * 1024  # bytes copied/hashed per read
+CSV_ROW_CHUNK = 4096  # CSV rows parsed before flushing into the track array
+UPLOAD_CACHE_DIR = "/src/uploads/"
+MAX_CACHED_FILES = 8  # finished artefacts (videos + tracks) kept on disk
+STALE_PART_SECONDS = 3600  # half-written files older than this are removed
+
+# Column order of a track row, matching the CSV layout written by app1.py.
+TRACK_KEYS = ["left_arm", "right_arm", "left_leg", "right_leg"]
+TRACK_WIDTH = 2 * len(TRACK_KEYS)
+
+
+# Artefacts currently played by a Streamlit session; prune_cache never removes these.
+_pinned = set()
+
+
+def pin_artefact(path):
+    _pinned.add(path)
+
+
+def unpin_artefact(path):
+    _pinned.discard(path)
+
+
+def cache_dir():
+    path = relativeToAbsolute(UPLOAD_CACHE_DIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def iter_chunks(fileobj, chunk_size=CHUNK_SIZE):
+    """Yield fixed-size byte chunks from the start of a file-like object."""
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def prune_cache(max_files=MAX_CACHED_FILES):
+    """
+    Keep the upload cache bounded: drop the least recently used artefacts beyond
+    max_files and any half-written ".part" files left behind by a crashed run.
+    Pinned artefacts are in use and are neither removed nor counted.
+    """
+    directory = cache_dir()
+    now = time.time()
+    finished = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            continue
+        if name.endswith(".part"):
+            if now - mtime > STALE_PART_SECONDS:
+                _remove_quietly(path)
+            continue
+        if path in _pinned:
+            continue
+        finished.append((mtime, path))
+    finished.sort(reverse=True)
+    for _, path in finished[max_files:]:
+        _remove_quietly(path)
+
+
+def store_upload(fileobj, suffix):
+    """
+    Store an uploaded file in the cache as <sha256><suffix>. The upload is hashed
+    first and only copied (in CHUNK_SIZE pieces) when no artefact with that hash
+    exists yet, so re-ingesting the same file costs a read, not a write.
+    Returns (path, digest).
+    """
+    directory = cache_dir()
+    hex_digest, _ = hash_upload(fileobj)
+    path = os.path.join(directory, hex_digest + suffix)
+    if os.path.exists(path):
+        os.utime(path)  # mark as recently used
+        return path, hex_digest
+    part = tempfile.NamedTemporaryFile(dir=directory, suffix=".part", delete=False)
+    try:
+        with part:
+            for chunk in iter_chunks(fileobj):
+                part.write(chunk)
+        os.replace(part.name, path)
+    except BaseException:
+        _remove_quietly(part.name)
+        raise
+    prune_cache()
+    return path, hex_digest
+
+
+def hash_upload(fileobj):
+    """
+    Return (sha256 hex digest, line count) of a file-like object, read in chunks.
+    Lines end in LF, CRLF or a bare CR, the same terminators csv.reader splits
+    on, so the count is an upper bound on the number of CSV rows.
+    """
+    digest = hashlib.sha256()
+    lines = 0
+    last = b""
+    for chunk in iter_chunks(fileobj):
+        digest.update(chunk)
+        lines += chunk.count(b"\n") + chunk.count(b"\r") - chunk.count(b"\r\n")
+        if last.endswith(b"\r") and chunk.startswith(b"\n"):
+            lines -= 1  # CRLF split across two chunks
+        last = chunk
+    if last and not last.endswith((b"\n", b"\r")):
+        lines += 1  # final row without a trailing newline
+    return digest.hexdigest(), lines
+
+
+def parse_track(fileobj, max_rows, columns=TRACK_WIDTH):
+    """
+    Parse a coordinates CSV into a (frames, columns) float array. Rows are read in
+    CSV_ROW_CHUNK batches and copied straight into an array preallocated for
+    max_rows; rows that are not `columns` numeric values (e.g. the header) are skipped.
+    """
+    track = np.empty((max_rows, columns), dtype=np.float64)
+    count = 0
+    fileobj.seek(0)
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")  # tolerate an Excel BOM
+    try:
+        batch = []
+        for row in csv.reader(text):
+            if len(row) != columns:
+                continue
+            try:
+                batch.append([float(v) for v in row])
+            except ValueError:
+                continue
+            if len(batch) == CSV_ROW_CHUNK:
+                track[count:count + len(batch)] = batch
+                count += len(batch)
+                batch = []
+        if batch:
+            track[count:count + len(batch)] = batch
+            count += len(batch)
+    finally:
+        text.detach()  # leave the caller's file object open
+    return track[:count]
+
+
+def load_track(fileobj):
+    """
+    Load an uploaded coordinates CSV as a NumPy track, reusing the cached .npy
+    artefact when a CSV with the same hash has been parsed before.
+    """
+    hex_digest, max_rows = hash_upload(fileobj)
+    path = os.path.join(cache_dir(), hex_digest + ".npy")
+    if os.path.exists(path):
+        os.utime(path)
+        return np.load(path)
+    track = parse_track(fileobj, max_rows)
+    part = tempfile.NamedTemporaryFile(dir=cache_dir(), suffix=".part", delete=False)
+    try:
+        with part:
+            np.save(part, track)
+        os.replace(part.name, path)
+    except BaseException:
+        _remove_quietly(part.name)
+        raise
+    prune_cache()
+    return track
+
+
+def read_track(path, columns=TRACK_WIDTH):
+    """Read a coordinates CSV from disk as a NumPy track, bypassing the upload cache."""
+    with open(path, "rb") as f:
+        _, max_rows = hash_upload(f)
+        return parse_track(f, max_rows, columns)
+
+
+def coords_to_track(coords_list):
+    """Convert a list of coordinate dicts into a (frames, 8) track array."""
+    track = np.empty((len(coords_list), TRACK_WIDTH), dtype=np.float64)
+    for i, coords in enumerate(coords_list):
+        track[i] = [v for key in TRACK_KEYS for v in coords[key]]
+    return track
+
+
+def track_coords(track, idx):
+    """Return frame idx of a track as the coordinate dict used by draw_overlays."""
+    row = track[idx]
+    return {key: (row[2 * i], row[2 * i + 1]) for i, key in enumerate(TRACK_KEYS)}
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass